@@ -6,6 +6,8 @@
 Module to handle Kafka topics management.
 """
 
+from contextlib import suppress
+
 from kafka.admin import (
     ACL,
     ACLFilter,
@@ -17,55 +19,132 @@ from kafka.admin import (
     ResourcePatternFilter,
     ResourceType,
 )
+from kafka.errors import (
+    AuthenticationFailedError,
+    KafkaConnectionError,
+    KafkaTimeoutError,
+    NoBrokersAvailable,
+    NodeNotReadyError,
+)
+
+CONNECTION_ERRORS = (
+    AuthenticationFailedError,
+    KafkaConnectionError,
+    KafkaTimeoutError,
+    NoBrokersAvailable,
+    NodeNotReadyError,
+)
+
+_ADMIN_CLIENTS = {}
+
+
+def _admin_client_key(cluster_info):
+    """
+    Cache key for the cluster admin clients. The password is left out so that a rotated password
+    replaces the existing client instead of leaving it connected under a stale key.
+
+    :param dict cluster_info:
+    :rtype: tuple
+    """
+    return (
+        cluster_info.get("bootstrap_servers"),
+        cluster_info.get("security_protocol"),
+        cluster_info.get("sasl_mechanism"),
+        cluster_info.get("sasl_plain_username"),
+    )
+
+
+def _close_admin_client(admin_client):
+    with suppress(Exception):
+        admin_client.close()
+
+
+def get_admin_client(cluster_info):
+    """
+    Function to get a Kafka admin client for the given cluster. Clients are kept at module level
+    so that warm Lambda invocations for the same cluster re-use the existing connection.
+    When the password changed, the existing client is closed and replaced.
+
+    :param dict cluster_info:
+    :return: the admin client
+    :rtype: kafka.admin.KafkaAdminClient
+    """
+    key = _admin_client_key(cluster_info)
+    password = cluster_info.get("sasl_plain_password")
+    cached = _ADMIN_CLIENTS.get(key)
+    if cached is not None:
+        if cached[0] == password:
+            return cached[1]
+        del _ADMIN_CLIENTS[key]
+        _close_admin_client(cached[1])
+    admin_client = KafkaAdminClient(**cluster_info)
+    _ADMIN_CLIENTS[key] = (password, admin_client)
+    return admin_client
+
 
+def discard_admin_client(cluster_info):
+    """
+    Function to remove the cached admin client for the given cluster, i.e. after it failed,
+    so that the next call to get_admin_client opens a new connection.
 
-def create_new_acls(acls, cluster_info):
+    :param dict cluster_info:
     """
-    Function to iterate over the given ACL policies and apply them
+    cached = _ADMIN_CLIENTS.pop(_admin_client_key(cluster_info), None)
+    if cached is not None:
+        _close_admin_client(cached[1])
+
+
+def create_new_acls(acls, admin_client):
+    """
+    Function to iterate over the given ACL policies and apply them in a single batched request
 
     :param list acls:
-    :param cluster_info:
+    :param kafka.admin.KafkaAdminClient admin_client:
     :return:
     """
-    admin_client = KafkaAdminClient(**cluster_info)
-    kafka_acls = []
-    for policy in acls:
-        if isinstance(policy, dict):
-            new_acl = ACL(
-                principal=policy["Principal"],
-                host=policy["Host"],
-                operation=ACLOperation[policy["Action"]],
-                permission_type=ACLPermissionType[policy["Effect"]],
-                resource_pattern=ResourcePattern(
-                    resource_type=ResourceType[policy["ResourceType"]],
-                    resource_name=policy["Resource"],
-                    pattern_type=ACLResourcePatternType[policy["PatternType"]],
-                ),
-            )
-            kafka_acls.append(new_acl)
-    admin_client.create_acls(kafka_acls)
-
-
-def delete_acls(acls, cluster_info):
+    kafka_acls = [
+        ACL(
+            principal=policy["Principal"],
+            host=policy.get("Host", "*"),
+            operation=ACLOperation[policy["Action"]],
+            permission_type=ACLPermissionType[policy["Effect"]],
+            resource_pattern=ResourcePattern(
+                resource_type=ResourceType[policy["ResourceType"]],
+                resource_name=policy["Resource"],
+                pattern_type=ACLResourcePatternType[
+                    policy.get("PatternType", "LITERAL")
+                ],
+            ),
+        )
+        for policy in acls
+        if isinstance(policy, dict)
+    ]
+    if kafka_acls:
+        admin_client.create_acls(kafka_acls)
+
+
+def delete_acls(acls, admin_client):
     """
-    Function to delete the ACLs.
+    Function to delete the ACLs in a single batched request.
     :param acls:
-    :param cluster_info:
+    :param kafka.admin.KafkaAdminClient admin_client:
     :return:
     """
-    admin_client = KafkaAdminClient(**cluster_info)
-    policies = []
-    for policy in acls:
-        new_filter = ACLFilter(
+    policies = [
+        ACLFilter(
             principal=policy["Principal"],
-            host=policy["Host"] if "Host" in policy else "*",
+            host=policy.get("Host", "*"),
             operation=ACLOperation[policy["Action"]],
             permission_type=ACLPermissionType[policy["Effect"]],
             resource_pattern=ResourcePatternFilter(
                 resource_type=ResourceType[policy["ResourceType"]],
                 resource_name=policy["Resource"],
-                pattern_type=ACLResourcePatternType[policy["PatternType"]],
+                pattern_type=ACLResourcePatternType[
+                    policy.get("PatternType", "LITERAL")
+                ],
             ),
         )
-        policies.append(new_filter)
-    admin_client.delete_acls(policies)
+        for policy in acls
+    ]
+    if policies:
+        admin_client.delete_acls(policies)
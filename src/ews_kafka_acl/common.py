@@ -5,41 +5,72 @@
 """Common functions """
 
 import logging
+from os import environ
+
+
+def get_log_level():
+    """
+    Function to get the logging level from the LOG_LEVEL environment variable.
+    Defaults to INFO when not set or not a known logging level name.
+
+    :rtype: int
+    """
+    level_name = (environ.get("LOG_LEVEL") or "INFO").strip().upper()
+    level = logging.getLevelName(level_name)
+    if isinstance(level, int):
+        return level
+    logging.getLogger(__name__).warning(
+        "Unknown LOG_LEVEL %s. Using INFO", environ.get("LOG_LEVEL")
+    )
+    return logging.INFO
+
 
 LOG = logging.getLogger(__name__)
-LOG.setLevel(logging.INFO)
+LOG.setLevel(get_log_level())
 
 
-def differentiate_old_new_acls(new_policies, old_policies):
+def canonicalize_policy(policy):
+    """
+    Hashable representation of a policy, with the optional properties set to their defaults
+
+    :param dict policy:
+    :rtype: tuple
+    """
+    return (
+        policy["Resource"],
+        policy.get("PatternType", "LITERAL"),
+        policy["Principal"],
+        policy["ResourceType"],
+        policy["Action"],
+        policy["Effect"],
+        policy.get("Host", "*"),
+    )
+
+
+def differentiate_old_new_acls(new_policies, old_policies, cluster_changed=False):
     """
     Function to differentiate with ACLs are common and shall be kept, which ones are to be added and then removed.
+    When the Kafka cluster changed, all the new ACLs are to be created and none deleted.
 
-    :param list new_policies:
-    :param list old_policies:
+    :param dict new_policies: new policies indexed by their canonicalize_policy key
+    :param dict old_policies: old policies indexed by their canonicalize_policy key
+    :param bool cluster_changed: whether the ACLs are applied to a different cluster than before
     :return: the new acls and old acls
     :rtype: tuple
     """
-
-    common_policies = [d for d in new_policies if d in old_policies]
-    LOG.info("Common policies")
-    LOG.info(common_policies)
-    common_policies_set = set()
-    for policy in common_policies:
-        common_policies_set.add(tuple(policy.items()))
-    new_policies_set = set()
-    old_policies_set = set()
-    for policy in new_policies:
-        t_policy = tuple(policy.items())
-        if t_policy not in new_policies_set or t_policy in common_policies:
-            new_policies_set.add(t_policy)
-    for policy in old_policies:
-        t_policy = tuple(policy.items())
-        if (
-            t_policy not in old_policies_set
-            and t_policy not in common_policies
-            and t_policy not in new_policies_set
-        ):
-            old_policies_set.add(t_policy)
-    final_delete_acls = [dict(k) for k in old_policies_set]
-    final_new_acls = [dict(k) for k in new_policies_set]
+    if cluster_changed:
+        return list(new_policies.values()), []
+    if new_policies.keys() == old_policies.keys():
+        return [], []
+    if LOG.isEnabledFor(logging.INFO):
+        LOG.info(
+            "Common policies: %s",
+            [new_policies[k] for k in new_policies.keys() & old_policies.keys()],
+        )
+    final_new_acls = [
+        new_policies[k] for k in new_policies.keys() - old_policies.keys()
+    ]
+    final_delete_acls = [
+        old_policies[k] for k in old_policies.keys() - new_policies.keys()
+    ]
     return final_new_acls, final_delete_acls
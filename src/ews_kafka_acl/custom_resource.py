@@ -4,163 +4,231 @@
 
 """Main module."""
 
+import logging
+import re
 import uuid
+from time import monotonic
 
-from aws_cfn_custom_resource_resolve_parser import handle
+import fastjsonschema
 from cfn_resource_provider import ResourceProvider
-from compose_x_common.compose_x_common import keyisset, keypresent
 
-from .acls_management import create_new_acls, delete_acls
-from .common import LOG, differentiate_old_new_acls
+from .common import LOG, canonicalize_policy, differentiate_old_new_acls
 
-
-class KafkaACL(ResourceProvider):
-    def __init__(self):
-        """
-        Init method
-        """
-        self.cluster_info = {}
-        super(KafkaACL, self).__init__()
-        self.request_schema = {
-            "definitions": {
-                "Policy": {
-                    "type": "object",
-                    "required": [
-                        "Resource",
-                        "Principal",
-                        "ResourceType",
-                        "Action",
-                        "Effect",
-                    ],
-                    "properties": {
-                        "Resource": {
-                            "type": "string",
-                            "pattern": "^[a-zA-Z0-9_.-]+$",
-                            "description": "Name of the resource to apply the ACL for",
-                            "$comment": "LITERAL or PREFIX value for the resource",
-                        },
-                        "PatternType": {
-                            "type": "string",
-                            "pattern": "^[A-Z]+$",
-                            "description": "Pattern type",
-                            "$comment": "LITERAL or PREFIXED",
-                            "enum": ["LITERAL", "PREFIXED", "MATCH"],
-                            "default": "LITERAL",
-                        },
-                        "Principal": {
-                            "type": "string",
-                            "description": "Kafka user to apply the ACLs for.",
-                            "$comment": "When using Confluent Kafka cloud, use the service account ID",
-                        },
-                        "ResourceType": {
-                            "type": "string",
-                            "description": "Kafka user to apply the ACLs for.",
-                            "enum": [
-                                "CLUSTER",
-                                "DELEGATION_TOKEN",
-                                "GROUP",
-                                "TOPIC",
-                                "TRANSACTIONAL_ID",
-                            ],
-                        },
-                        "Action": {
-                            "type": "string",
-                            "description": "Access action allowed.",
-                            "enum": [
-                                "ALL",
-                                "READ",
-                                "WRITE",
-                                "CREATE",
-                                "DELETE",
-                                "ALTER",
-                                "DESCRIBE",
-                                "CLUSTER_ACTION",
-                                "DESCRIBE_CONFIGS",
-                                "ALTER_CONFIGS",
-                                "IDEMPOTENT_WRITE",
-                            ],
-                        },
-                        "Effect": {
-                            "type": "string",
-                            "description": "Effect for the ACL.",
-                            "$comment": "Whether you allow or deny the access",
-                            "enum": ["DENY", "ALLOW"],
-                        },
-                        "Host": {
-                            "type": "string",
-                            "description": "Specify the host for the ACL. Defaults to '*'",
-                            "default": "*",
-                        },
-                    },
-                }
-            },
+_REQUEST_SCHEMA = {
+    "definitions": {
+        "Policy": {
+            "type": "object",
+            "required": [
+                "Resource",
+                "Principal",
+                "ResourceType",
+                "Action",
+                "Effect",
+            ],
             "properties": {
-                "Policies": {
-                    "type": "array",
-                    "insertionOrder": False,
-                    "uniqueItems": False,
-                    "items": {"$ref": "#/definitions/Policy"},
+                "Resource": {
+                    "type": "string",
+                    "pattern": "^[a-zA-Z0-9_.-]+$",
+                    "description": "Name of the resource to apply the ACL for",
+                    "$comment": "LITERAL or PREFIX value for the resource",
                 },
-                "Id": {
+                "PatternType": {
                     "type": "string",
-                    "description": "Unique ID registered for this ACL",
-                    "$comment": "Generated by the system",
+                    "pattern": "^[A-Z]+$",
+                    "description": "Pattern type",
+                    "$comment": "LITERAL or PREFIXED",
+                    "enum": ["LITERAL", "PREFIXED", "MATCH"],
+                    "default": "LITERAL",
                 },
-                "BootstrapServers": {
+                "Principal": {
                     "type": "string",
-                    "minLength": 3,
-                    "description": "Endpoint URL of the Kafka cluster in the format hostname:port",
+                    "description": "Kafka user to apply the ACLs for.",
+                    "$comment": "When using Confluent Kafka cloud, use the service account ID",
                 },
-                "SecurityProtocol": {
+                "ResourceType": {
                     "type": "string",
-                    "default": "PLAINTEXT",
-                    "description": "Kafka Security Protocol.",
-                    "enum": ["PLAINTEXT", "SSL", "SASL_PLAINTEXT", "SASL_SSL"],
+                    "description": "Kafka user to apply the ACLs for.",
+                    "enum": [
+                        "CLUSTER",
+                        "DELEGATION_TOKEN",
+                        "GROUP",
+                        "TOPIC",
+                        "TRANSACTIONAL_ID",
+                    ],
                 },
-                "SASLMechanism": {
+                "Action": {
                     "type": "string",
-                    "default": "PLAIN",
-                    "description": "Kafka SASL mechanism for Authentication",
+                    "description": "Access action allowed.",
                     "enum": [
-                        "PLAIN",
-                        "GSSAPI",
-                        "OAUTHBEARER",
-                        "SCRAM-SHA-256",
-                        "SCRAM-SHA-512",
+                        "ALL",
+                        "READ",
+                        "WRITE",
+                        "CREATE",
+                        "DELETE",
+                        "ALTER",
+                        "DESCRIBE",
+                        "CLUSTER_ACTION",
+                        "DESCRIBE_CONFIGS",
+                        "ALTER_CONFIGS",
+                        "IDEMPOTENT_WRITE",
                     ],
                 },
-                "SASLUsername": {
+                "Effect": {
                     "type": "string",
-                    "default": "",
-                    "description": "Kafka SASL username for Authentication",
+                    "description": "Effect for the ACL.",
+                    "$comment": "Whether you allow or deny the access",
+                    "enum": ["DENY", "ALLOW"],
                 },
-                "SASLPassword": {
+                "Host": {
                     "type": "string",
-                    "default": "",
-                    "description": "Kafka SASL password for Authentication",
+                    "description": "Specify the host for the ACL. Defaults to '*'",
+                    "default": "*",
                 },
             },
-            "required": ["BootstrapServers", "Policies"],
         }
+    },
+    "properties": {
+        "Policies": {
+            "type": "array",
+            "insertionOrder": False,
+            "uniqueItems": False,
+            "items": {"$ref": "#/definitions/Policy"},
+        },
+        "Id": {
+            "type": "string",
+            "description": "Unique ID registered for this ACL",
+            "$comment": "Generated by the system",
+        },
+        "BootstrapServers": {
+            "type": "string",
+            "minLength": 3,
+            "description": "Endpoint URL of the Kafka cluster in the format hostname:port",
+        },
+        "SecurityProtocol": {
+            "type": "string",
+            "default": "PLAINTEXT",
+            "description": "Kafka Security Protocol.",
+            "enum": ["PLAINTEXT", "SSL", "SASL_PLAINTEXT", "SASL_SSL"],
+        },
+        "SASLMechanism": {
+            "type": "string",
+            "default": "PLAIN",
+            "description": "Kafka SASL mechanism for Authentication",
+            "enum": [
+                "PLAIN",
+                "GSSAPI",
+                "OAUTHBEARER",
+                "SCRAM-SHA-256",
+                "SCRAM-SHA-512",
+            ],
+        },
+        "SASLUsername": {
+            "type": "string",
+            "default": "",
+            "description": "Kafka SASL username for Authentication",
+        },
+        "SASLPassword": {
+            "type": "string",
+            "default": "",
+            "description": "Kafka SASL password for Authentication",
+        },
+    },
+    "required": ["BootstrapServers", "Policies"],
+}
+
+_validate = fastjsonschema.compile(_REQUEST_SCHEMA)
+
+_RESOLVE_RE = re.compile(r"resolve:secretsmanager:")
+
+_CACHE_TTL = 300
+_RESOLVED_SECRETS = {}
+
+
+def _resolve_secret(spec):
+    """
+    Resolves the secretsmanager dynamic reference. Results are kept for _CACHE_TTL seconds to avoid
+    calling SecretsManager again on warm invocations, while still picking up rotated secrets.
+
+    :param str spec: the resolve:secretsmanager string
+    :return: the resolved value
+    :rtype: str
+    """
+    cached = _RESOLVED_SECRETS.get(spec)
+    if cached is not None and cached[1] > monotonic():
+        return cached[0]
+    from aws_cfn_custom_resource_resolve_parser import handle
+
+    value = handle(spec)
+    _RESOLVED_SECRETS[spec] = (value, monotonic() + _CACHE_TTL)
+    return value
+
+
+class KafkaACL(ResourceProvider):
+    __slots__ = ("cluster_info", "_cluster_info_cache")
+
+    def __init__(self):
+        """
+        Init method
+        """
+        self.cluster_info = {}
+        self._cluster_info_cache = {}
+        super(KafkaACL, self).__init__()
+        self.request_schema = _REQUEST_SCHEMA
+
+    def is_valid_request(self):
+        """
+        Validates the properties against the compiled request schema, injecting defaults.
+        Avoids re-building the validator on every request as the parent does.
+        """
+        try:
+            self.convert_property_types()
+            _validate(self.properties)
+            return True
+        except fastjsonschema.JsonSchemaException as error:
+            self.fail(f"invalid resource properties: {error.message}")
+            return False
+
+    def cluster_settings_key(self):
+        """
+        Cluster settings, as defined in the properties, used as the cluster information cache key
 
-    def convert_property_types(self):
-        int_props = []
-        boolean_props = []
-        for prop in int_props:
-            if keypresent(prop, self.properties) and isinstance(
-                self.properties[prop], str
-            ):
-                self.properties[prop] = int(self.properties[prop])
-        for prop in boolean_props:
-            if keypresent(prop, self.properties) and isinstance(
-                self.properties[prop], str
-            ):
-                self.properties[prop] = self.properties[prop].lower() == "true"
+        :rtype: tuple
+        """
+        return (
+            self.get("BootstrapServers"),
+            self.get("SecurityProtocol"),
+            self.get("SASLMechanism"),
+            self.get("SASLUsername"),
+            self.get("SASLPassword"),
+        )
+
+    def discard_cluster_caches(self, error):
+        """
+        Method to drop the cached admin client after a Kafka failure. On connection or authentication
+        failures, the cached cluster information and secrets are dropped too, so that the next invocation
+        resolves the credentials again, i.e. after a secret rotation.
+
+        :param Exception error: the error raised by the Kafka calls
+        """
+        from .acls_management import CONNECTION_ERRORS, discard_admin_client
+
+        discard_admin_client(self.cluster_info)
+        if isinstance(error, CONNECTION_ERRORS):
+            self._cluster_info_cache.pop(self.cluster_settings_key(), None)
+            for setting in ("BootstrapServers", "SASLUsername", "SASLPassword"):
+                _RESOLVED_SECRETS.pop(self.get(setting), None)
 
     def define_cluster_info(self):
         """
-        Method to define the cluster information into a simple format
+        Method to define the cluster information into a simple format.
+        The resolved information is cached per cluster settings for _CACHE_TTL seconds.
         """
+        cache_key = self.cluster_settings_key()
+        cached = self._cluster_info_cache.get(cache_key)
+        if cached is not None and cached[1] > monotonic():
+            self.cluster_info = cached[0]
+            return
+        self.cluster_info = {}
         try:
             self.cluster_info["bootstrap_servers"] = self.get("BootstrapServers")
             self.cluster_info["security_protocol"] = self.get("SecurityProtocol")
@@ -170,33 +238,44 @@ class KafkaACL(ResourceProvider):
         except Exception as error:
             self.fail(f"Failed to get cluster information - {str(error)}")
 
-        for key, value in self.cluster_info.items():
-            if isinstance(value, str) and value.find(r"resolve:secretsmanager") >= 0:
+        for key in ("bootstrap_servers", "sasl_plain_username", "sasl_plain_password"):
+            value = self.cluster_info.get(key)
+            if value is not None and _RESOLVE_RE.search(value):
                 print("Found a resolve secrets. Trying to resolve the value")
                 try:
-                    self.cluster_info[key] = handle(value)
+                    self.cluster_info[key] = _resolve_secret(value)
                 except Exception as error:
                     LOG.error(error)
                     LOG.error("Failed to import secrets from SecretsManager")
                     self.fail(str(error))
+        if self.status != "FAILED":
+            self._cluster_info_cache[cache_key] = (
+                self.cluster_info,
+                monotonic() + _CACHE_TTL,
+            )
 
     def create(self):
         """
         Method to create a new Kafka topic
         :return:
         """
+        from .acls_management import create_new_acls, get_admin_client
+
         self.define_cluster_info()
-        LOG.info(f"Connecting to {self.cluster_info['bootstrap_servers']}")
-        LOG.info(f"Attempting to create new ACLs {self.get('Name')}")
+        if self.status == "FAILED":
+            return
+        LOG.info("Connecting to %s", self.cluster_info["bootstrap_servers"])
+        LOG.info("Attempting to create new ACLs %s", self.get("Name"))
         try:
             topic_name = create_new_acls(
                 self.get("Policies"),
-                self.cluster_info,
+                get_admin_client(self.cluster_info),
             )
             self.physical_resource_id = str(uuid.uuid4())
             self.set_attribute("Id", self.physical_resource_id)
             self.success(f"Created new ACLs {topic_name}")
         except Exception as error:
+            self.discard_cluster_caches(error)
             self.physical_resource_id = "could-not-create"
             self.fail(f"Failed to create the ACLs. {str(error)}")
 
@@ -204,28 +283,49 @@ class KafkaACL(ResourceProvider):
         """
         :return:
         """
+        from .acls_management import create_new_acls, delete_acls, get_admin_client
+
+        old_policies = {
+            canonicalize_policy(policy): policy for policy in self.get_old("Policies")
+        }
+        new_policies = {
+            canonicalize_policy(policy): policy for policy in self.get("Policies")
+        }
+        acls = differentiate_old_new_acls(
+            new_policies,
+            old_policies,
+            self.get("BootstrapServers") != self.get_old("BootstrapServers"),
+        )
+        if not acls[0] and not acls[1]:
+            LOG.info("No ACLs changes")
+            self.success()
+            return
         self.define_cluster_info()
-        old_policies = self.get_old("Policies")
-        for policy in old_policies:
-            if not keyisset("Host", policy):
-                policy.update({"Host": "*"})
-        new_policies = self.get("Policies")
-        acls = differentiate_old_new_acls(new_policies, old_policies)
-        LOG.info("ACLs deletion")
-        LOG.info(acls[1])
-        LOG.info("ACLs set")
-        LOG.info(acls[0])
+        if self.status == "FAILED":
+            return
+        if LOG.isEnabledFor(logging.INFO):
+            LOG.info("ACLs to delete: %s", acls[1])
+            LOG.info("ACLs to set: %s", acls[0])
         try:
-            delete_acls(acls[1], self.cluster_info)
+            admin_client = get_admin_client(self.cluster_info)
+        except Exception as error:
+            self.discard_cluster_caches(error)
+            LOG.error(error)
+            LOG.error("Failed to connect to the Kafka cluster")
+            self.fail(str(error))
+            return
+        try:
+            delete_acls(acls[1], admin_client)
         except Exception as error:
             LOG.error("Failed to delete old ACLs - Moving on")
             LOG.error(error)
             LOG.error(acls[1])
         try:
-            create_new_acls(acls[0], self.cluster_info)
+            create_new_acls(acls[0], admin_client)
             self.success()
             LOG.info("Successfully created new ACLs")
         except Exception as error:
+            self.discard_cluster_caches(error)
             LOG.error(error)
             LOG.error("Failed to create new ACLs")
             self.fail(str(error))
@@ -235,16 +335,31 @@ class KafkaACL(ResourceProvider):
         Method to delete the Topic resource
         :return:
         """
+        from .acls_management import delete_acls, get_admin_client
+
         self.define_cluster_info()
+        if self.status == "FAILED":
+            return
         try:
-            delete_acls(self.get("Policies"), self.cluster_info)
+            delete_acls(self.get("Policies"), get_admin_client(self.cluster_info))
             self.success("ACLs deleted")
         except Exception as error:
+            self.discard_cluster_caches(error)
             self.fail(
                 f"Failed to delete topic {self.get_attribute('Name')}. {str(error)}"
             )
 
 
+_PROVIDER = None
+
+
 def lambda_handler(event, context):
-    provider = KafkaACL()
-    provider.handle(event, context)
+    """
+    Lambda entrypoint. The provider is created once per Lambda container and re-used for warm invocations,
+    ResourceProvider.handle resets the request, context and response state for each event.
+    """
+    global _PROVIDER
+    if _PROVIDER is None:
+        _PROVIDER = KafkaACL()
+    _PROVIDER.cluster_info = {}
+    _PROVIDER.handle(event, context)
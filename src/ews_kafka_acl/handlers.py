@@ -16,8 +16,13 @@ from cloudformation_cli_python_lib import (
     identifier_utils,
 )
 
-from .acls_management import create_new_acls, delete_acls
-from .common import differentiate_old_new_acls
+from .acls_management import (
+    create_new_acls,
+    delete_acls,
+    discard_admin_client,
+    get_admin_client,
+)
+from .common import canonicalize_policy, differentiate_old_new_acls
 from .models import ResourceHandlerRequest, ResourceModel
 
 LOG = logging.getLogger(__name__)
@@ -43,6 +48,18 @@ def get_cluster_config(model):
     return cluster_config
 
 
+def index_policies(policies):
+    """
+    Indexes the Policy models by their canonical key, as dicts for the ACLs management functions
+
+    :param list policies:
+    :return: the policies indexed by canonicalize_policy
+    :rtype: dict
+    """
+    serialized_policies = [policy._serialize() for policy in policies]
+    return {canonicalize_policy(policy): policy for policy in serialized_policies}
+
+
 @resource.handler(Action.CREATE)
 def create_handler(
     session: Optional[SessionProxy],
@@ -64,9 +81,10 @@ def create_handler(
                 client_request_token=request.clientRequestToken,
                 max_length=255,
             )
-        create_new_acls(list(model.Policies), cluster_config)
+        create_new_acls(list(model.Policies), get_admin_client(cluster_config))
         progress.status = OperationStatus.SUCCESS
     except Exception as e:
+        discard_admin_client(cluster_config)
         return ProgressEvent.failed(
             HandlerErrorCode.InternalFailure, f"was not expecting type {str(e)}"
         )
@@ -86,11 +104,17 @@ def update_handler(
     )
     old_model = request.previousResourceState
     cluster_config = get_cluster_config(model)
-    acls = differentiate_old_new_acls(list(model.Policies), list(old_model.Policies))
     try:
-        delete_acls(acls[1], cluster_config)
-        create_new_acls(acls[0], cluster_config)
+        acls = differentiate_old_new_acls(
+            index_policies(model.Policies),
+            index_policies(old_model.Policies),
+            model.BootstrapServers != old_model.BootstrapServers,
+        )
+        admin_client = get_admin_client(cluster_config)
+        delete_acls(acls[1], admin_client)
+        create_new_acls(acls[0], admin_client)
     except Exception as error:
+        discard_admin_client(cluster_config)
         return ProgressEvent.failed(
             HandlerErrorCode.InternalFailure, f"Failed to update ACLs {str(error)}"
         )
@@ -110,9 +134,10 @@ def delete_handler(
     )
     cluster_config = get_cluster_config(model)
     try:
-        delete_acls(model.Policies, cluster_config)
+        delete_acls(model.Policies, get_admin_client(cluster_config))
         return progress
     except Exception as error:
+        discard_admin_client(cluster_config)
         return ProgressEvent.failed(
             HandlerErrorCode.InternalFailure, f"was not expecting type {str(error)}"
         )
@@ -0,0 +1,50 @@
+#  -*- coding: utf-8 -*-
+# SPDX-License-Identifier: MPL-2.0
+# Copyright 2021 John Mille<john@ews-network.net>
+
+"""Tests for `ews_kafka_acl.acls_management`."""
+
+from unittest import mock
+
+import pytest
+
+from ews_kafka_acl import acls_management
+
+CLUSTER_INFO = {
+    "bootstrap_servers": "broker:9092",
+    "security_protocol": "SASL_SSL",
+    "sasl_mechanism": "PLAIN",
+    "sasl_plain_username": "user",
+    "sasl_plain_password": "password",
+}
+
+
+@pytest.fixture(autouse=True)
+def admin_client_class(monkeypatch):
+    monkeypatch.setattr(acls_management, "_ADMIN_CLIENTS", {})
+    client_class = mock.Mock(side_effect=lambda **kwargs: mock.Mock())
+    monkeypatch.setattr(acls_management, "KafkaAdminClient", client_class)
+    return client_class
+
+
+def test_get_admin_client_reuses_client(admin_client_class):
+    client = acls_management.get_admin_client(dict(CLUSTER_INFO))
+    assert acls_management.get_admin_client(dict(CLUSTER_INFO)) is client
+    assert admin_client_class.call_count == 1
+
+
+def test_get_admin_client_replaces_client_on_password_change():
+    client = acls_management.get_admin_client(dict(CLUSTER_INFO))
+    rotated = acls_management.get_admin_client(
+        {**CLUSTER_INFO, "sasl_plain_password": "rotated"}
+    )
+    assert rotated is not client
+    client.close.assert_called_once_with()
+    assert len(acls_management._ADMIN_CLIENTS) == 1
+
+
+def test_discard_admin_client():
+    client = acls_management.get_admin_client(dict(CLUSTER_INFO))
+    acls_management.discard_admin_client(dict(CLUSTER_INFO))
+    client.close.assert_called_once_with()
+    assert acls_management.get_admin_client(dict(CLUSTER_INFO)) is not client
@@ -0,0 +1,83 @@
+#  -*- coding: utf-8 -*-
+# SPDX-License-Identifier: MPL-2.0
+# Copyright 2021 John Mille<john@ews-network.net>
+
+"""Tests for `ews_kafka_acl.common`."""
+
+import logging
+
+import pytest
+
+from ews_kafka_acl.common import (
+    canonicalize_policy,
+    differentiate_old_new_acls,
+    get_log_level,
+)
+
+
+def policy(**kwargs):
+    return {
+        "Resource": "topic-a",
+        "Principal": "User:app",
+        "ResourceType": "TOPIC",
+        "Action": "READ",
+        "Effect": "ALLOW",
+        **kwargs,
+    }
+
+
+def index(policies):
+    return {canonicalize_policy(policy): policy for policy in policies}
+
+
+def test_canonicalize_policy_defaults():
+    assert canonicalize_policy(policy()) == canonicalize_policy(
+        policy(Host="*", PatternType="LITERAL")
+    )
+    assert canonicalize_policy(policy()) != canonicalize_policy(policy(Host="10.0.0.1"))
+
+
+def test_differentiate_old_new_acls():
+    kept = policy()
+    added = policy(Action="WRITE")
+    removed = policy(Action="DELETE")
+    new_acls, delete_acls = differentiate_old_new_acls(
+        index([kept, added]), index([policy(Host="*"), removed])
+    )
+    assert new_acls == [added]
+    assert delete_acls == [removed]
+
+
+def test_differentiate_old_new_acls_no_change():
+    assert differentiate_old_new_acls(
+        index([policy(), policy(Action="WRITE")]),
+        index([policy(Action="WRITE"), policy(PatternType="LITERAL")]),
+    ) == ([], [])
+
+
+def test_differentiate_old_new_acls_cluster_changed():
+    policies = [policy(), policy(Action="WRITE")]
+    new_acls, delete_acls = differentiate_old_new_acls(
+        index(policies), index(policies), cluster_changed=True
+    )
+    assert new_acls == policies
+    assert delete_acls == []
+
+
+@pytest.mark.parametrize(
+    "value, level",
+    [
+        (None, logging.INFO),
+        ("", logging.INFO),
+        (" warning ", logging.WARNING),
+        ("debug", logging.DEBUG),
+        ("20", logging.INFO),
+        ("verbose", logging.INFO),
+    ],
+)
+def test_get_log_level(monkeypatch, value, level):
+    if value is None:
+        monkeypatch.delenv("LOG_LEVEL", raising=False)
+    else:
+        monkeypatch.setenv("LOG_LEVEL", value)
+    assert get_log_level() == level
@@ -0,0 +1,182 @@
+#  -*- coding: utf-8 -*-
+# SPDX-License-Identifier: MPL-2.0
+# Copyright 2021 John Mille<john@ews-network.net>
+
+"""Tests for `ews_kafka_acl.custom_resource`."""
+
+from unittest import mock
+
+import pytest
+from kafka.errors import AuthenticationFailedError
+
+from ews_kafka_acl import acls_management, custom_resource
+from ews_kafka_acl.custom_resource import KafkaACL
+
+PASSWORD_REF = "{{resolve:secretsmanager:kafka-creds:SecretString:password}}"
+
+POLICY = {
+    "Resource": "topic-a",
+    "Principal": "User:app",
+    "ResourceType": "TOPIC",
+    "Action": "READ",
+    "Effect": "ALLOW",
+}
+
+
+def properties(**kwargs):
+    return {
+        "BootstrapServers": "broker:9092",
+        "SecurityProtocol": "SASL_SSL",
+        "SASLUsername": "app",
+        "SASLPassword": PASSWORD_REF,
+        "Policies": [dict(POLICY)],
+        **kwargs,
+    }
+
+
+def cfn_request(request_type, resource_properties, old_properties=None):
+    request = {
+        "RequestType": request_type,
+        "ResponseURL": "https://cloudformation-custom-resource-response.example.com/",
+        "StackId": "arn:aws:cloudformation:eu-west-1:123456789012:stack/test/id",
+        "RequestId": "request-id",
+        "ResourceType": "Custom::KafkaACL",
+        "LogicalResourceId": "NewACL",
+        "ResourceProperties": resource_properties,
+    }
+    if old_properties is not None:
+        request["PhysicalResourceId"] = "acl-id"
+        request["OldResourceProperties"] = old_properties
+    return request
+
+
+def run(provider, request):
+    provider.set_request(request, None)
+    provider.execute()
+    return provider.response
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = mock.Mock(return_value=1000.0)
+    monkeypatch.setattr(custom_resource, "monotonic", clock)
+    return clock
+
+
+@pytest.fixture
+def secrets(monkeypatch):
+    monkeypatch.setattr(custom_resource, "_RESOLVED_SECRETS", {})
+    handle = mock.Mock(return_value="secret-password")
+    monkeypatch.setattr("aws_cfn_custom_resource_resolve_parser.handle", handle)
+    return handle
+
+
+@pytest.fixture
+def kafka(monkeypatch):
+    kafka = mock.Mock()
+    for name in (
+        "get_admin_client",
+        "create_new_acls",
+        "delete_acls",
+        "discard_admin_client",
+    ):
+        monkeypatch.setattr(acls_management, name, getattr(kafka, name))
+    return kafka
+
+
+def test_invalid_request_properties(kafka):
+    provider = KafkaACL()
+    response = run(
+        provider,
+        cfn_request("Create", properties(Policies=[{**POLICY, "Effect": "MAYBE"}])),
+    )
+    assert response["Status"] == "FAILED"
+    assert response["Reason"].startswith("invalid resource properties:")
+    kafka.create_new_acls.assert_not_called()
+
+
+def test_request_defaults_injected(clock, secrets, kafka):
+    provider = KafkaACL()
+    request = cfn_request("Create", properties())
+    del request["ResourceProperties"]["SecurityProtocol"]
+    assert run(provider, request)["Status"] == "SUCCESS"
+    assert provider.properties["SecurityProtocol"] == "PLAINTEXT"
+    assert provider.properties["Policies"][0]["Host"] == "*"
+    assert provider.properties["Policies"][0]["PatternType"] == "LITERAL"
+
+
+def test_secret_cached_within_ttl(clock, secrets, kafka):
+    assert run(KafkaACL(), cfn_request("Create", properties()))["Status"] == "SUCCESS"
+    clock.return_value += custom_resource._CACHE_TTL - 1
+    assert run(KafkaACL(), cfn_request("Create", properties()))["Status"] == "SUCCESS"
+    secrets.assert_called_once_with(PASSWORD_REF)
+    cluster_info = kafka.get_admin_client.call_args[0][0]
+    assert cluster_info["sasl_plain_password"] == "secret-password"
+
+
+def test_cluster_info_cached_within_ttl(clock, secrets, kafka):
+    provider = KafkaACL()
+    run(provider, cfn_request("Create", properties()))
+    custom_resource._RESOLVED_SECRETS.clear()
+    run(provider, cfn_request("Create", properties()))
+    secrets.assert_called_once_with(PASSWORD_REF)
+
+
+def test_secret_resolved_again_once_expired(clock, secrets, kafka):
+    run(KafkaACL(), cfn_request("Create", properties()))
+    clock.return_value += custom_resource._CACHE_TTL + 1
+    secrets.return_value = "rotated-password"
+    run(KafkaACL(), cfn_request("Create", properties()))
+    assert secrets.call_count == 2
+    cluster_info = kafka.get_admin_client.call_args[0][0]
+    assert cluster_info["sasl_plain_password"] == "rotated-password"
+
+
+def test_authentication_failure_drops_cached_credentials(clock, secrets, kafka):
+    provider = KafkaACL()
+    kafka.create_new_acls.side_effect = AuthenticationFailedError()
+    response = run(provider, cfn_request("Create", properties()))
+    assert response["Status"] == "FAILED"
+    kafka.discard_admin_client.assert_called_once()
+    assert PASSWORD_REF not in custom_resource._RESOLVED_SECRETS
+    assert not provider._cluster_info_cache
+
+    kafka.create_new_acls.side_effect = None
+    assert run(provider, cfn_request("Create", properties()))["Status"] == "SUCCESS"
+    assert secrets.call_count == 2
+
+
+def test_other_failure_keeps_cached_credentials(clock, secrets, kafka):
+    provider = KafkaACL()
+    kafka.create_new_acls.side_effect = ValueError("invalid ACL")
+    assert run(provider, cfn_request("Create", properties()))["Status"] == "FAILED"
+    kafka.discard_admin_client.assert_called_once()
+    assert PASSWORD_REF in custom_resource._RESOLVED_SECRETS
+    assert provider._cluster_info_cache
+
+
+def test_failed_resolution_not_cached(clock, secrets, kafka):
+    provider = KafkaACL()
+    secrets.side_effect = Exception("AccessDenied")
+    response = run(provider, cfn_request("Create", properties()))
+    assert response["Status"] == "FAILED"
+    assert PASSWORD_REF not in custom_resource._RESOLVED_SECRETS
+    assert not provider._cluster_info_cache
+
+    secrets.side_effect = None
+    assert run(provider, cfn_request("Create", properties()))["Status"] == "SUCCESS"
+    assert secrets.call_count == 2
+
+
+def test_update_without_acls_changes(clock, secrets, kafka):
+    provider = KafkaACL()
+    request = cfn_request(
+        "Update",
+        properties(),
+        properties(Policies=[{**POLICY, "Host": "*", "PatternType": "LITERAL"}]),
+    )
+    with mock.patch.object(KafkaACL, "define_cluster_info") as define_cluster_info:
+        assert run(provider, request)["Status"] == "SUCCESS"
+    define_cluster_info.assert_not_called()
+    kafka.get_admin_client.assert_not_called()
+    secrets.assert_not_called()